@@ -1,15 +1,22 @@
 """Color utilities for nicks."""
 
+from functools import lru_cache
 
+
+@lru_cache(maxsize=4096)
 def nick_to_rgb(nick: str) -> tuple[float, float, float]:
     """
     Deterministically map a nickname to an RGB tuple (0..1 per channel).
     Uses a hash to pick a hue, then tweaks saturation/value to keep colors readable.
     """
-    h = 5381
-    for ch in nick.lower():
-        h = ((h << 5) + h) + ord(ch)
-    hue = (h % 360) / 360.0
+    # DJB2 over the lowercased nick. Only h % 360 is used, so reducing at every
+    # step keeps h small without changing the result. Iterating bytes yields
+    # the character codes directly for the common all-ASCII case.
+    codes = nick.encode("ascii").lower() if nick.isascii() else map(ord, nick.lower())
+    h = 5381 % 360
+    for c in codes:
+        h = (h * 33 + c) % 360
+    hue = h / 360.0
     s = 0.55
     v = 0.75
 
@@ -16,18 +16,17 @@ MIRC_MONOSPACE = "\x11"
 MIRC_REVERSE = "\x16"
 
 
+# Control characters dropped by strip_irc_formatting: everything below 0x20
+# except tab, newline and ESC. The mIRC bold/italic/underline/reset/monospace/
+# reverse toggles all fall in this range.
+_CTRL_TABLE = dict.fromkeys(c for c in range(0x20) if c not in (0x09, 0x0A, 0x1B))
+_COLOR_RE = re.compile(r"\x03\d{1,2}(?:,\d{1,2})?")
+
+
 def strip_irc_formatting(s: str) -> str:
-    s = re.sub(r"\x03(\d{1,2})(,\d{1,2})?", "", s)
-    s = (
-        s.replace(MIRC_BOLD, "")
-        .replace(MIRC_ITALIC, "")
-        .replace(MIRC_UNDERLINE, "")
-        .replace(MIRC_RESET, "")
-        .replace(MIRC_MONOSPACE, "")
-        .replace(MIRC_REVERSE, "")
-    )
-    s = re.sub(r"[\x00-\x08\x0B-\x1A\x1C-\x1F]", "", s)
-    return s
+    if MIRC_COLOR in s:
+        s = _COLOR_RE.sub("", s)
+    return s.translate(_CTRL_TABLE)
 
 
 class Kind(str, enum.Enum):
@@ -37,7 +36,7 @@ class Kind(str, enum.Enum):
     RAW = "raw"
 
 
-@dataclass
+@dataclass(slots=True)
 class ParsedLine:
     timestamp: Optional[str]
     nick: Optional[str]
@@ -52,12 +51,19 @@ PATTERN2 = re.compile(
 PATTERN3 = re.compile(r"^\s*\[?(\d{1,2}:\d{2}(?::\d{2})?)\]?\s+\*\s+(\S+)\s+(.*)$")
 PATTERN_SYS1 = re.compile(r"^\s*(?:\*\*\*|-->|<--|—>|<-)\s+(.*)$")
 PATTERN_SYS2 = re.compile(r"^\s*-{2,}\s+(.*)$")
+PATTERN_FALLBACK = re.compile(r"^\s*<([^>]+)>\s+(.*)$")
+
+# Literal prefixes required by PATTERN_SYS1/PATTERN_SYS2; checked before the regexes.
+SYSTEM_PREFIXES = ("***", "--", "<-", "—>")
 
 
 def parse_line(line: str) -> ParsedLine:
     """Parse a single log line into structured data."""
     raw = strip_irc_formatting(line.rstrip("\n"))
-    ts_nick_text = PATTERN2.match(raw) or PATTERN1.match(raw) or PATTERN3.match(raw)
+    has_nick = "<" in raw
+    ts_nick_text = None
+    if has_nick:
+        ts_nick_text = PATTERN2.match(raw) or PATTERN1.match(raw)
     if ts_nick_text:
         return ParsedLine(
             timestamp=ts_nick_text.group(1),
@@ -66,7 +72,18 @@ def parse_line(line: str) -> ParsedLine:
             kind=Kind.MESSAGE,
         )
 
-    system_nick_text = PATTERN_SYS1.match(raw) or PATTERN_SYS2.match(raw)
+    ts_action_text = PATTERN3.match(raw) if "*" in raw else None
+    if ts_action_text:
+        return ParsedLine(
+            timestamp=ts_action_text.group(1),
+            nick=ts_action_text.group(2),
+            text=ts_action_text.group(3),
+            kind=Kind.ACTION,
+        )
+
+    system_nick_text = None
+    if raw.lstrip().startswith(SYSTEM_PREFIXES):
+        system_nick_text = PATTERN_SYS1.match(raw) or PATTERN_SYS2.match(raw)
     if system_nick_text:
         return ParsedLine(
             timestamp=None,
@@ -74,7 +91,7 @@ def parse_line(line: str) -> ParsedLine:
             text=system_nick_text.group(1),
             kind=Kind.SYSTEM,
         )
-    message_nick_text = re.match(r"^\s*<([^>]+)>\s+(.*)$", raw)
+    message_nick_text = PATTERN_FALLBACK.match(raw) if has_nick else None
     if message_nick_text:
         return ParsedLine(
             timestamp=None,
@@ -2,10 +2,20 @@
 
 from __future__ import annotations
 
+import hashlib
 import io
 import logging
+import os
 import re
+import tempfile
+import threading
+import time
+import urllib.error
 import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 from urllib.parse import urlparse
 
@@ -15,8 +25,27 @@ logger = logging.getLogger(__name__)
 
 URL_RE = re.compile(r"(https?://\S+)")
 IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".tif", ".tiff")
+USER_AGENT = "irc-log-pdf/1.0"
+READ_CHUNK_BYTES = 64 * 1024
+IMAGE_CACHE_MAX_AGE_S = 7 * 24 * 3600
+DOWNLOAD_MEMO_MAX_BYTES = 64 * 1024 * 1024
 
+# On-disk image cache; None unless enabled with enable_image_cache().
+_image_cache_dir: Optional[Path] = None
 
+# Downloads memoized in memory, keyed by (url, max_bytes) and bounded by the
+# total size of the stored bodies. Failures are kept as None.
+_downloads: OrderedDict[tuple[str, int], Optional[bytes]] = OrderedDict()
+_downloads_size = 0
+_downloads_lock = threading.Lock()
+
+IMAGE_READER_CACHE_SIZE = 32
+
+# Most recently used ImageReaders, keyed by URL.
+_IMAGE_READERS: OrderedDict[str, tuple[ImageReader, tuple[int, int]]] = OrderedDict()
+
+
+@lru_cache(maxsize=2048)
 def looks_like_image_url(url: str) -> bool:
     try:
         path = urlparse(url).path.lower()
@@ -26,15 +55,167 @@ def looks_like_image_url(url: str) -> bool:
         return False
 
 
+def default_image_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "irc-render"
+
+
+def enable_image_cache(path: Optional[Path] = None) -> None:
+    """
+    Keep downloaded images on disk between runs, under path or the per-user
+    cache directory. The directory is created private to the current user;
+    the cache stays disabled if it is owned by someone else.
+    """
+    global _image_cache_dir
+    path = path or default_image_cache_dir()
+    try:
+        path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if hasattr(os, "getuid") and path.stat().st_uid != os.getuid():
+            logger.warning("not using image cache %s: owned by another user", path)
+            return
+    except OSError as exc:
+        logger.warning("not using image cache %s: %s", path, exc)
+        return
+    _image_cache_dir = path
+
+
+def _cache_path(cache_dir: Path, url: str) -> Path:
+    return cache_dir / hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def _fresh_cache_entry(url: str) -> Optional[Path]:
+    if _image_cache_dir is None:
+        return None
+    path = _cache_path(_image_cache_dir, url)
+    try:
+        if time.time() - path.stat().st_mtime > IMAGE_CACHE_MAX_AGE_S:
+            return None
+    except OSError:
+        return None
+    return path
+
+
+def _read_cached_image(url: str, max_bytes: int) -> Optional[bytes]:
+    path = _fresh_cache_entry(url)
+    if path is None:
+        return None
+    try:
+        if path.stat().st_size > max_bytes:
+            return None
+        data = path.read_bytes()
+    except OSError as exc:
+        logger.debug("failed to read cached image for %s: %s", url, exc)
+        return None
+    logger.debug("using cached image for %s (%d bytes)", url, len(data))
+    return data
+
+
+def store_cached_image(url: str, data: bytes) -> None:
+    """Write image data to the on-disk cache, if enabled and not yet fresh."""
+    cache_dir = _image_cache_dir
+    if cache_dir is None or _fresh_cache_entry(url) is not None:
+        return
+    try:
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp, _cache_path(cache_dir, url))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError as exc:
+        logger.debug("failed to cache image for %s: %s", url, exc)
+
+
+def _recall_download(key: tuple[str, int]) -> tuple[bool, Optional[bytes]]:
+    with _downloads_lock:
+        if key not in _downloads:
+            return False, None
+        _downloads.move_to_end(key)
+        return True, _downloads[key]
+
+
+def _remember_download(key: tuple[str, int], data: Optional[bytes]) -> None:
+    global _downloads_size
+    size = len(data) if data else 0
+    if size > DOWNLOAD_MEMO_MAX_BYTES:
+        return
+    with _downloads_lock:
+        old = _downloads.pop(key, None)
+        _downloads_size -= len(old) if old else 0
+        _downloads[key] = data
+        _downloads_size += size
+        while _downloads_size > DOWNLOAD_MEMO_MAX_BYTES:
+            _, evicted = _downloads.popitem(last=False)
+            _downloads_size -= len(evicted) if evicted else 0
+
+
+def _head_allows_download(url: str, max_bytes: int, timeout: int) -> bool:
+    """
+    Check url with a HEAD request before fetching the body.
+    Returns False when the host is unreachable or times out, or when the
+    server reports a text body or an oversized body. HTTP errors fall
+    through to the GET, since some servers refuse HEAD but serve GET.
+    """
+    req = urllib.request.Request(url, method="HEAD", headers={"User-Agent": USER_AGENT})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            content_type = resp.headers.get("Content-Type", "")
+            content_length = resp.headers.get("Content-Length")
+    except urllib.error.HTTPError as exc:
+        logger.debug("HEAD %s returned %s, trying GET", url, exc.code)
+        return True
+    except (urllib.error.URLError, TimeoutError) as exc:
+        logger.info("skipping %s: HEAD request failed: %s", url, exc)
+        return False
+    except Exception as exc:
+        logger.debug("HEAD %s failed, trying GET: %s", url, exc)
+        return True
+
+    if content_type.startswith("text/"):
+        logger.info("skipping %s: content-type %s is not an image", url, content_type)
+        return False
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        logger.info(
+            "skipping %s: content-length %s exceeds limit %d",
+            url,
+            content_length,
+            max_bytes,
+        )
+        return False
+    return True
+
+
 def download_image_bytes(
     url: str,
     max_bytes: int = 5 * 1024 * 1024,
     timeout: int = 7,
 ) -> Optional[bytes]:
-    """Download up to max_bytes from url. Returns bytes or None on failure."""
+    """
+    Download up to max_bytes from url. Returns bytes or None on failure.
+    Results, including failures, are memoized in memory up to
+    DOWNLOAD_MEMO_MAX_BYTES in total, and the on-disk cache is consulted
+    first when enabled.
+    """
+    key = (url, max_bytes)
+    found, data = _recall_download(key)
+    if found:
+        return data
+    data = _read_cached_image(url, max_bytes)
+    if data is None:
+        data = _fetch_image_bytes(url, max_bytes, timeout)
+    _remember_download(key, data)
+    return data
+
+
+def _fetch_image_bytes(url: str, max_bytes: int, timeout: int) -> Optional[bytes]:
+    if not _head_allows_download(url, max_bytes, timeout):
+        return None
+
     logger.info(f"downloading image {url}")
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": "irc-log-pdf/1.0"})
+        req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
         with urllib.request.urlopen(req, timeout=timeout) as resp:
             content_length = resp.headers.get("Content-Length")
             if content_length and int(content_length) > max_bytes:
@@ -45,10 +226,16 @@ def download_image_bytes(
                     max_bytes,
                 )
                 return None
-            data = resp.read(max_bytes + 1)
-            if len(data) > max_bytes:
+            buf = bytearray()
+            while len(buf) <= max_bytes:
+                chunk = resp.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                buf += chunk
+            if len(buf) > max_bytes:
                 logger.warning("skipping %s: response exceeded byte limit", url)
                 return None
+            data = bytes(buf)
             logger.debug("downloaded %s (%d bytes)", url, len(data))
             return data
     except Exception as exc:
@@ -56,10 +243,37 @@ def download_image_bytes(
         return None
 
 
-def load_image_reader(data: bytes) -> tuple[ImageReader, tuple[int, int]]:
-    """Create a ReportLab ImageReader and return it with pixel dimensions."""
+def prefetch_images(
+    executor: Executor,
+    text: str,
+    futures: dict[str, Future[Optional[bytes]]],
+) -> None:
+    """Submit a download for every image URL in text not already in futures."""
+    if "http" not in text:
+        return
+    for m in URL_RE.finditer(text):
+        url = m.group(1)
+        if url not in futures and looks_like_image_url(url):
+            logger.debug("prefetching %s", url)
+            futures[url] = executor.submit(download_image_bytes, url)
+
+
+def load_image_reader(data: bytes, url: str) -> tuple[ImageReader, tuple[int, int]]:
+    """
+    Create a ReportLab ImageReader and return it with pixel dimensions.
+    The last IMAGE_READER_CACHE_SIZE readers are kept per url, so an image
+    repeated close together is only decoded once.
+    Only called from the rendering thread.
+    """
+    cached = _IMAGE_READERS.get(url)
+    if cached is not None:
+        _IMAGE_READERS.move_to_end(url)
+        return cached
     bio = io.BytesIO(data)
     img = ImageReader(bio)
     size = img.getSize()
     logger.debug("loaded image (%d x %d)", size[0], size[1])
+    _IMAGE_READERS[url] = (img, size)
+    if len(_IMAGE_READERS) > IMAGE_READER_CACHE_SIZE:
+        _IMAGE_READERS.popitem(last=False)
     return img, size
@@ -2,9 +2,11 @@
 
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Iterable, Iterator, Optional
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, letter
@@ -13,35 +15,60 @@ from reportlab.pdfgen import canvas
 
 from .colors import nick_to_rgb
 from .fonts import safe_register_mono_font
-from .formatting import ParsedLine
+from .formatting import Kind, ParsedLine
 from .images import (
     URL_RE,
     download_image_bytes,
+    enable_image_cache,
     load_image_reader,
     looks_like_image_url,
+    prefetch_images,
+    store_cached_image,
 )
 
+TS_COLOR = colors.HexColor("#666666")
+ACTION_COLOR = colors.HexColor("#444444")
+MARKER_COLOR = colors.HexColor("#888888")
+SYSTEM_COLOR = colors.HexColor("#666666")
 
-def draw_wrapped_text(c, text, x, y, max_width, font_name, font_size):
-    """Draw text within max_width using simple word wrapping."""
+
+def draw_wrapped_text(c, text, x, y, max_width, em_width, leading):
+    """
+    Draw text within max_width using simple word wrapping.
+    The font is monospace, so wrapping is done on a character budget.
+    All wrapped lines go into a single PDF text object; leading must match
+    the leading the canvas font was set with.
+    """
     words = text.split()
+    if not words:
+        return y
+    limit = int(max_width // em_width)
+    text_obj = c.beginText(x, y)
     line = ""
-    while words:
-        w = words.pop(0)
-        candidate = w if not line else line + " " + w
-        if pdfmetrics.stringWidth(candidate, font_name, font_size) <= max_width:
-            line = candidate
+    for w in words:
+        if not line:
+            line = w
+        elif len(line) + 1 + len(w) <= limit:
+            line += " " + w
         else:
-            if line:
-                c.drawString(x, y, line)
-                y -= font_size * 1.4
+            text_obj.textLine(line)
+            y -= leading
             line = w
     if line:
-        c.drawString(x, y, line)
-        y -= font_size * 1.4
+        text_obj.textLine(line)
+        y -= leading
+    c.drawText(text_obj)
     return y
 
 
+def _append_text(pending: str, segment: str) -> str:
+    """Join a text segment onto the pending text, collapsing surrounding space."""
+    stripped = segment.strip()
+    if not stripped:
+        return pending + segment
+    return pending + ("" if pending == "" else " ") + stripped
+
+
 @dataclass
 class RenderConfig:
     title: str
@@ -70,15 +97,20 @@ class PDFRenderer:
         self.bottom = config.margin
         self.y = self.top
 
-        self.ts_width = (
-            pdfmetrics.stringWidth("[00:00] ", self.font_name, config.font_size) * 1.1
-        )
-        self.max_nick_width = pdfmetrics.stringWidth(
-            "<nick> ", self.font_name, config.font_size
-        )
+        # safe_register_mono_font only hands out monospace fonts, so every
+        # glyph advance equals the width of "M".
+        self.em_width = pdfmetrics.stringWidth("M", self.font_name, config.font_size)
+        # Line spacing of the body font, used by draw_wrapped_text.
+        self.leading = config.font_size * 1.4
+        self.ts_width = self._text_width("[00:00] ") * 1.1
+        self.max_nick_width = self._text_width("<nick> ")
+
+        # Downloads started ahead of rendering, keyed by URL. Entries are
+        # dropped once rendered; repeats are served by the download cache.
+        self.image_futures: dict[str, Future[Optional[bytes]]] = {}
 
         self.page_num = 1
-        self._draw_page_header()
+        self._begin_page(is_first=True)
 
     def render(self, lines: Iterable[ParsedLine]) -> None:
         for pl in lines:
@@ -88,12 +120,16 @@ class PDFRenderer:
         self._finish_page_footer()
         self.canvas.save()
 
-    def _draw_page_header(self) -> None:
+    def _begin_page(self, is_first: bool = False) -> None:
+        if not is_first:
+            self.canvas.showPage()
+            self.page_num += 1
+            self.y = self.top
         self.canvas.setFont(self.font_name, self.config.font_size + 3)
         self.canvas.setFillColor(colors.black)
         self.canvas.drawString(self.left, self.y, self.config.title)
         self.y -= (self.config.font_size + 8) * 1.6
-        self.canvas.setFont(self.font_name, self.config.font_size)
+        self.canvas.setFont(self.font_name, self.config.font_size, leading=self.leading)
 
     def _finish_page_footer(self) -> None:
         self.canvas.setFont(self.font_name, self.config.font_size - 2)
@@ -101,79 +137,71 @@ class PDFRenderer:
         self.canvas.drawRightString(
             self.right, self.bottom / 2, f"Page {self.page_num}"
         )
-        self.canvas.setFont(self.font_name, self.config.font_size)
-
-    def _new_page(self) -> None:
-        self.canvas.showPage()
-        self.page_num += 1
-        self.y = self.top
-        self.canvas.setFont(self.font_name, self.config.font_size + 3)
-        self.canvas.setFillColor(colors.black)
-        self.canvas.drawString(self.left, self.y, self.config.title)
-        self.y -= (self.config.font_size + 8) * 1.6
-        self.canvas.setFont(self.font_name, self.config.font_size)
 
     def _maybe_new_page(self) -> None:
         if self.y < self.bottom + 2 * self.config.font_size:
             self._finish_page_footer()
-            self._new_page()
+            self._begin_page()
 
     def _ensure_space(self, h_needed: float) -> None:
         if self.y < self.bottom + h_needed:
             self._finish_page_footer()
-            self._new_page()
+            self._begin_page()
+
+    def _text_width(self, text: str) -> float:
+        return len(text) * self.em_width
 
     def _update_nick_width(self, pl: ParsedLine) -> None:
         if pl.nick:
-            w = pdfmetrics.stringWidth(
-                f"<{pl.nick}> ", self.font_name, self.config.font_size
-            )
+            w = self._text_width(f"<{pl.nick}> ")
             if w > self.max_nick_width:
                 max_possible = self.right - self.left - self.ts_width - 50
                 self.max_nick_width = min(w, max_possible)
 
     def _render_line(self, pl: ParsedLine) -> None:
-        x = self.left
-        font_size = self.config.font_size
+        x = self.left if pl.timestamp else self.left + self.ts_width * 0.4
+        # Timestamp, nick and marker share one PDF text object per line. The
+        # font is monospace, so textOut leaves the cursor where the next
+        # segment starts.
+        text = self.canvas.beginText(x, self.y)
 
         # Timestamp
         if pl.timestamp:
             ts_text = f"[{pl.timestamp}] "
-            self.canvas.setFillColor(colors.HexColor("#666666"))
-            self.canvas.drawString(x, self.y, ts_text)
-            x += pdfmetrics.stringWidth(ts_text, self.font_name, font_size)
-        else:
-            x += self.ts_width * 0.4
+            text.setFillColor(TS_COLOR)
+            text.textOut(ts_text)
+            x += self._text_width(ts_text)
 
         # Nick / markers
-        if pl.kind == "message" and pl.nick:
+        if pl.kind is Kind.MESSAGE and pl.nick:
             nick_text = f"<{pl.nick}> "
             r, g, b = nick_to_rgb(pl.nick)
-            self.canvas.setFillColorRGB(r, g, b)
-            self.canvas.drawString(x, self.y, nick_text)
+            text.setFillColorRGB(r, g, b)
+            text.textOut(nick_text)
             x += self.max_nick_width
-        elif pl.kind == "action" and pl.nick:
+        elif pl.kind is Kind.ACTION and pl.nick:
             star = "* "
-            self.canvas.setFillColor(colors.HexColor("#444444"))
-            self.canvas.drawString(x, self.y, star)
-            x += pdfmetrics.stringWidth(star, self.font_name, font_size)
+            text.setFillColor(ACTION_COLOR)
+            text.textOut(star)
+            x += self._text_width(star)
 
             r, g, b = nick_to_rgb(pl.nick)
-            self.canvas.setFillColorRGB(r, g, b)
             nick_text = f"{pl.nick} "
-            self.canvas.drawString(x, self.y, nick_text)
+            text.setFillColorRGB(r, g, b)
+            text.textOut(nick_text)
             x += self.max_nick_width
         else:
             marker = "— "
-            self.canvas.setFillColor(colors.HexColor("#888888"))
-            self.canvas.drawString(x, self.y, marker)
-            x += pdfmetrics.stringWidth(marker, self.font_name, font_size)
+            text.setFillColor(MARKER_COLOR)
+            text.textOut(marker)
+            x += self._text_width(marker)
+        self.canvas.drawText(text)
 
         # Text color by line type
-        if pl.kind == "system":
-            self.canvas.setFillColor(colors.HexColor("#666666"))
-        elif pl.kind == "action":
-            self.canvas.setFillColor(colors.HexColor("#444444"))
+        if pl.kind is Kind.SYSTEM:
+            self.canvas.setFillColor(SYSTEM_COLOR)
+        elif pl.kind is Kind.ACTION:
+            self.canvas.setFillColor(ACTION_COLOR)
         else:
             self.canvas.setFillColor(colors.black)
 
@@ -183,17 +211,27 @@ class PDFRenderer:
     def _render_text_with_inline_images(
         self, text: str, x_start: float, y_cur: float, msg_w: float
     ) -> float:
-        tokens = URL_RE.split(text)
-        pending_text = ""
-        font_size = self.config.font_size
+        # Most lines carry no URL at all; skip the regex scan for them.
+        if "http" not in text:
+            return draw_wrapped_text(
+                self.canvas,
+                text,
+                x_start,
+                y_cur,
+                msg_w,
+                self.em_width,
+                self.leading,
+            )
 
-        for tok in tokens:
-            if not URL_RE.fullmatch(tok) or not looks_like_image_url(tok):
-                pending_text += (
-                    ("" if pending_text == "" else " ") + tok.strip()
-                    if tok.strip()
-                    else tok
-                )
+        pending_text = ""
+        pos = 0
+
+        for m in URL_RE.finditer(text):
+            pending_text = _append_text(pending_text, text[pos : m.start()])
+            url = m.group(1)
+            pos = m.end()
+            if not looks_like_image_url(url):
+                pending_text = _append_text(pending_text, url)
                 continue
 
             if pending_text.strip():
@@ -203,17 +241,18 @@ class PDFRenderer:
                     x_start,
                     y_cur,
                     msg_w,
-                    self.font_name,
-                    font_size,
+                    self.em_width,
+                    self.leading,
                 )
                 pending_text = ""
 
-            maybe_y = self._render_inline_image(tok, x_start, y_cur, msg_w)
+            maybe_y = self._render_inline_image(url, x_start, y_cur, msg_w)
             if maybe_y is None:
-                pending_text += (" " if pending_text else "") + tok
+                pending_text += (" " if pending_text else "") + url
             else:
                 y_cur = maybe_y
 
+        pending_text = _append_text(pending_text, text[pos:])
         if pending_text.strip():
             y_cur = draw_wrapped_text(
                 self.canvas,
@@ -221,8 +260,8 @@ class PDFRenderer:
                 x_start,
                 y_cur,
                 msg_w,
-                self.font_name,
-                font_size,
+                self.em_width,
+                self.leading,
             )
 
         return y_cur
@@ -231,13 +270,16 @@ class PDFRenderer:
         self, url: str, x_start: float, y_cur: float, msg_w: float
     ) -> Optional[float]:
         """Download and render an inline image. Returns the updated y or None on failure."""
-        data = download_image_bytes(url)
+        future = self.image_futures.pop(url, None)
+        data = future.result() if future else download_image_bytes(url)
         if not data:
             return None
 
         font_size = self.config.font_size
         try:
-            img, (iw, ih) = load_image_reader(data)
+            img, (iw, ih) = load_image_reader(data, url)
+            # Only persist data that ReportLab accepted as an image.
+            store_cached_image(url, data)
             target_w = min(msg_w, self.config.max_image_width_pt)
             scale = min(target_w / iw, self.config.max_image_height_pt / ih, 1.0)
             disp_w = iw * scale
@@ -267,6 +309,26 @@ class PDFRenderer:
             return None
 
 
+def _with_prefetch(
+    lines: Iterable[ParsedLine],
+    executor: Executor,
+    futures: dict[str, Future[Optional[bytes]]],
+    window: int = 256,
+) -> Iterator[ParsedLine]:
+    """
+    Yield lines in order while staying up to window lines ahead, starting
+    image downloads for the lines in that window.
+    """
+    buffer: deque[ParsedLine] = deque()
+    for pl in lines:
+        prefetch_images(executor, pl.text, futures)
+        buffer.append(pl)
+        if len(buffer) > window:
+            yield buffer.popleft()
+    while buffer:
+        yield buffer.popleft()
+
+
 def render_pdf(
     input_path: Path,
     output_path: str,
@@ -276,7 +338,10 @@ def render_pdf(
     margin: int,
     max_image_width_pt: int,
     max_image_height_pt: int,
+    image_cache: bool = False,
 ) -> None:
+    if image_cache:
+        enable_image_cache()
     config = RenderConfig(
         title=title,
         page_size_name=page_size_name,
@@ -289,4 +354,14 @@ def render_pdf(
 
     parser = IRCLogParser()
     renderer = PDFRenderer(output_path, config)
-    renderer.render(parser.parse_file(input_path))
+    executor = ThreadPoolExecutor(max_workers=8)
+    try:
+        renderer.render(
+            _with_prefetch(
+                parser.parse_file(input_path), executor, renderer.image_futures
+            )
+        )
+    finally:
+        # Do not wait for queued prefetches if rendering failed or was
+        # interrupted.
+        executor.shutdown(wait=False, cancel_futures=True)
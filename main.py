@@ -43,6 +43,14 @@ def build_parser() -> argparse.ArgumentParser:
         default=260,
         help="Maximum inline image height (points)",
     )
+    parser.add_argument(
+        "--image-cache",
+        action=argparse.BooleanOptionalAction,
+        default=os.environ.get("IRC_RENDER_IMAGE_CACHE", "") not in ("", "0"),
+        help="Keep downloaded images in $XDG_CACHE_HOME/irc-render "
+        "(~/.cache/irc-render if unset) between runs; "
+        "the default can be set with the IRC_RENDER_IMAGE_CACHE env var",
+    )
     parser.add_argument(
         "--log-level",
         default=os.environ.get("IRC_RENDER_LOG_LEVEL", "INFO"),
@@ -75,6 +83,7 @@ def main() -> None:
         args.margin,
         args.max_image_width,
         args.max_image_height,
+        image_cache=args.image_cache,
     )
 
 